@@ -1,12 +1,114 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # SQLite database file named manga.db in the project root
 DATABASE_URL = "sqlite:///./manga.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./manga.db"
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},  # required for SQLite + FastAPI
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=3600,
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers keep going while a writer holds the database
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA foreign_keys=ON")  # needed for ON DELETE CASCADE
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    # One transaction on a pooled connection: commit on success,
+    # roll back on error, always return the connection to the pool.
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# Async engine for the read-only pages and API routes. Uses the default
+# connection pool so each request doesn't open a new connection (and
+# aiosqlite thread), re-run the pragmas and start with a cold page cache.
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Full-text index over manga titles, kept in sync with the manga table by
+# triggers. Needs the manga table to exist already.
+_SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS manga_fts
+    USING fts5(title, alt_title, content='manga', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS manga_fts_ai AFTER INSERT ON manga BEGIN
+        INSERT INTO manga_fts(rowid, title, alt_title)
+        VALUES (new.id, new.title, new.alt_title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS manga_fts_ad AFTER DELETE ON manga BEGIN
+        INSERT INTO manga_fts(manga_fts, rowid, title, alt_title)
+        VALUES ('delete', old.id, old.title, old.alt_title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS manga_fts_au AFTER UPDATE ON manga BEGIN
+        INSERT INTO manga_fts(manga_fts, rowid, title, alt_title)
+        VALUES ('delete', old.id, old.title, old.alt_title);
+        INSERT INTO manga_fts(rowid, title, alt_title)
+        VALUES (new.id, new.title, new.alt_title);
+    END
+    """,
+]
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).first() is not None
+
+
+def init_search_index() -> None:
+    # Idempotent; does nothing until the manga table exists
+    with engine.begin() as conn:
+        if not _table_exists(conn, "manga"):
+            return
+        exists = _table_exists(conn, "manga_fts")
+        for statement in _SEARCH_INDEX_DDL:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            # Index manga rows that were created before the search table
+            conn.exec_driver_sql("INSERT INTO manga_fts(manga_fts) VALUES ('rebuild')")
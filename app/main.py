@@ -1,3 +1,9 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from threading import Lock
 from typing import Optional, List
 
 from fastapi import (
@@ -8,15 +14,18 @@ from fastapi import (
     Query,
     Form,
 )
-from fastapi.responses import RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, or_, select, column, table, text
+from sqlalchemy.exc import IntegrityError
 
 from starlette.middleware.sessions import SessionMiddleware
+from jinja2 import FileSystemBytecodeCache
 
-from .database import engine
+from .database import AsyncSessionLocal, engine, init_search_index
 from .models import (
     Base,
     Manga,
@@ -25,54 +34,139 @@ from .models import (
     CustomList,
     CustomListItem,
 )
-from .deps import get_db
+from .deps import get_async_db, get_db
 from . import schemas
+from .security import get_password_hash, pwd_context, verify_password
 
-from passlib.context import CryptContext
+import orjson
+from cachetools import TTLCache
 
 # -----------------------------
 # Setup
 # -----------------------------
 
-# Create tables on startup (dev-friendly)
-Base.metadata.create_all(bind=engine)
+# Create tables on startup only when asked to (CREATE_TABLES=1), so
+# regular worker boots don't re-check the schema. The title search index
+# is always ensured: it is cheap and title search fails without it.
+def create_tables() -> None:
+    if os.getenv("CREATE_TABLES") == "1":
+        Base.metadata.create_all(bind=engine)
+    init_search_index()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_tables()
+    start_hash_pool()
+    try:
+        yield
+    finally:
+        shutdown_hash_pool()
+
+
+app = FastAPI(title="Manga Index", lifespan=lifespan)
 
-app = FastAPI(title="Manga Index")
 
 # Session middleware for login sessions
 # IMPORTANT: change this secret key in a real project
 app.add_middleware(SessionMiddleware, secret_key="CHANGE_ME_SUPER_SECRET")
 
-# Static files (CSS, your own images, etc.)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Static files (CSS, your own images, etc.). In production the reverse
+# proxy serves /static itself; set SERVE_STATIC=1 to serve it from here.
+if os.getenv("SERVE_STATIC") == "1":
+    app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Jinja2 templates
 templates = Jinja2Templates(directory="templates")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# In production (TEMPLATE_CACHE=1) keep compiled templates on disk and
+# stop re-checking the template files on every render.
+if os.getenv("TEMPLATE_CACHE") == "1":
+    templates.env.bytecode_cache = FileSystemBytecodeCache()
+    templates.env.auto_reload = False
+
+# Verified against when the login identifier matches no user, so unknown
+# usernames cost the same hash check as real ones. It must cost as much as
+# the slowest hash still stored (legacy bcrypt-12, which the argon2 settings
+# in app.security are tuned to match); revisit it whenever those change.
+_DUMMY_HASH = pwd_context.hash("dummy")
+
+
+# -----------------------------
+# Response helpers
+# -----------------------------
+
+def render_page(name: str, context: dict) -> HTMLResponse:
+    # Render through the Jinja environment directly, skipping the extra
+    # context handling of TemplateResponse. Used by the hot public pages.
+    return HTMLResponse(templates.env.get_template(name).render(context))
+
+
+class OrjsonResponse(Response):
+    # For routes that return plain dicts without a response_model
+    # (FastAPI's own ORJSONResponse is deprecated).
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
 
 # -----------------------------
 # Auth helpers
 # -----------------------------
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# Password hashing is CPU-bound, so the async auth routes hand it to a small
+# pool of worker processes and never block the loop. The pool is capped
+# (HASH_WORKERS, default 2) because every uvicorn worker gets its own, and
+# uses forkserver so workers aren't forked from a process running threads
+# (spawn where forkserver isn't available, e.g. Windows).
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_hash_pool() -> None:
+    global _hash_pool
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        start_method = "forkserver"
+    else:
+        start_method = "spawn"
+    _hash_pool = ProcessPoolExecutor(
+        max_workers=int(os.getenv("HASH_WORKERS", "2")),
+        mp_context=multiprocessing.get_context(start_method),
+    )
+
 
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown()
+        _hash_pool = None
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_pool, verify_password, plain_password, hashed_password
+    )
 
 
 def get_current_user(
     request: Request,
     db: Session = Depends(get_db),
 ) -> Optional[User]:
+    # Reuse the user already loaded earlier in this request
+    if hasattr(request.state, "_cached_user"):
+        return request.state._cached_user
+
     user_id = request.session.get("user_id")
-    if not user_id:
-        return None
-    user = db.query(User).filter(User.id == user_id).first()
+    user = None
+    if user_id:
+        user = db.query(User).filter(User.id == user_id).first()
+    request.state._cached_user = user
     return user
 
 
@@ -81,27 +175,117 @@ def require_admin(user: Optional[User]) -> None:
         raise HTTPException(status_code=403, detail="Admin access required")
 
 
+# -----------------------------
+# Title search
+# -----------------------------
+
+def title_search_filter(q: str):
+    # Every word must prefix-match the title or alt title, so "one pi"
+    # finds "One Piece". Words are quoted so FTS syntax in q is literal.
+    terms = " ".join(
+        '"{}"*'.format(word.replace('"', '""')) for word in q.split()
+    )
+    matching_ids = (
+        select(column("rowid"))
+        .select_from(table("manga_fts"))
+        .where(text("manga_fts MATCH :terms").bindparams(terms=terms))
+    )
+    return Manga.id.in_(matching_ids)
+
+
+# -----------------------------
+# Manga listing cache
+# -----------------------------
+
+# The catalog rarely changes, so the listings on "/" and "/api/manga" are
+# kept in a short-lived cache keyed by page and search term. Adding a
+# manga clears it.
+_listing_cache: TTLCache = TTLCache(maxsize=128, ttl=30)
+_listing_cache_lock = Lock()
+
+
+async def _cached_listing(key, load):
+    with _listing_cache_lock:
+        listing = _listing_cache.get(key)
+    if listing is not None:
+        return listing
+
+    listing = await load()
+    with _listing_cache_lock:
+        _listing_cache[key] = listing
+    return listing
+
+
+def _search_manga(stmt, q: Optional[str]):
+    if q and q.strip():
+        stmt = stmt.where(title_search_filter(q))
+    return stmt.order_by(Manga.title).limit(100)
+
+
+async def get_manga_cards(db: AsyncSession, q: Optional[str]) -> list:
+    # Only the columns the index page shows (skips the description text)
+    async def load():
+        result = await db.execute(
+            _search_manga(
+                select(
+                    Manga.id,
+                    Manga.title,
+                    Manga.alt_title,
+                    Manga.cover_image_url,
+                    Manga.status,
+                    Manga.type,
+                ),
+                q,
+            )
+        )
+        return result.all()
+
+    return await _cached_listing(("cards", q or ""), load)
+
+
+async def get_manga_listing(db: AsyncSession, q: Optional[str]) -> List[dict]:
+    # Plain rows straight from the table: no ORM instances or pydantic
+    # models, orjson encodes the dicts as they are.
+    async def load():
+        result = await db.execute(_search_manga(select(Manga.__table__), q))
+        return [dict(row) for row in result.mappings()]
+
+    return await _cached_listing(("api", q or ""), load)
+
+
+def clear_manga_listing_cache() -> None:
+    with _listing_cache_lock:
+        _listing_cache.clear()
+
+
+async def load_user_lists(user_id: int) -> List[CustomList]:
+    # Uses its own session so it can run alongside another query
+    # (an AsyncSession only runs one statement at a time).
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CustomList)
+            .where(CustomList.user_id == user_id)
+            .order_by(CustomList.name)
+        )
+        return result.scalars().all()
+
+
 # -----------------------------
 # HTML PAGES (PUBLIC)
 # -----------------------------
 
 @app.get("/", tags=["pages"])
-def home(
+async def home(
     request: Request,
     q: Optional[str] = Query(default=None, description="Search by title"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user),
 ):
-    query = db.query(Manga)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Manga.title.ilike(like))
-    manga_list: List[Manga] = query.order_by(Manga.title).limit(100).all()
+    manga_list = await get_manga_cards(db, q)
 
-    return templates.TemplateResponse(
+    return render_page(
         "index.html",
         {
-            "request": request,
             "manga_list": manga_list,
             "q": q or "",
             "user": current_user,
@@ -110,33 +294,33 @@ def home(
 
 
 @app.get("/manga/{manga_id}", tags=["pages"])
-def manga_detail(
+async def manga_detail(
     manga_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user),
 ):
-    manga = db.query(Manga).filter(Manga.id == manga_id).first()
-    if not manga:
-        raise HTTPException(status_code=404, detail="Manga not found")
-
-    chapters = sorted(manga.chapters, key=lambda c: c.number)
-
+    manga_query = db.execute(
+        select(Manga)
+        .options(selectinload(Manga.chapters))
+        .where(Manga.id == manga_id)
+    )
     user_lists: List[CustomList] = []
     if current_user:
-        user_lists = (
-            db.query(CustomList)
-            .filter(CustomList.user_id == current_user.id)
-            .order_by(CustomList.name)
-            .all()
+        result, user_lists = await asyncio.gather(
+            manga_query, load_user_lists(current_user.id)
         )
+    else:
+        result = await manga_query
+    manga = result.scalar_one_or_none()
+    if not manga:
+        raise HTTPException(status_code=404, detail="Manga not found")
 
-    return templates.TemplateResponse(
+    return render_page(
         "manga_detail.html",
         {
-            "request": request,
             "manga": manga,
-            "chapters": chapters,
+            "chapters": manga.chapters,  # ordered by chapter number
             "user": current_user,
             "user_lists": user_lists,
         },
@@ -163,24 +347,25 @@ def register_form(
 
 
 @app.post("/auth/register", tags=["auth"])
-def register_submit(
+async def register_submit(
     request: Request,
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user),
 ):
     if current_user:
         return RedirectResponse(url="/", status_code=303)
 
     # Check if username or email already exists
-    existing = (
-        db.query(User)
-        .filter(or_(User.username == username, User.email == email))
-        .first()
+    result = await db.execute(
+        select(User.id)
+        .where(or_(User.username == username, User.email == email))
+        .limit(1)
     )
-    if existing:
+    exists = result.first() is not None
+    if exists:
         return templates.TemplateResponse(
             "auth_register.html",
             {
@@ -190,7 +375,7 @@ def register_submit(
             },
         )
 
-    hashed = get_password_hash(password)
+    hashed = await get_password_hash_async(password)
     user = User(
         username=username,
         email=email,
@@ -198,8 +383,7 @@ def register_submit(
         role="user",  # always normal user
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()  # user.id is set by the INSERT
 
     # Log them in immediately
     request.session["user_id"] = user.id
@@ -222,22 +406,25 @@ def login_form(
 
 
 @app.post("/auth/login", tags=["auth"])
-def login_submit(
+async def login_submit(
     request: Request,
     identifier: str = Form(...),  # username or email
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user),
 ):
     if current_user:
         return RedirectResponse(url="/", status_code=303)
 
-    user = (
-        db.query(User)
-        .filter(or_(User.username == identifier, User.email == identifier))
-        .first()
+    result = await db.execute(
+        select(User).where(
+            or_(User.username == identifier, User.email == identifier)
+        )
     )
-    if not user or not verify_password(password, user.password_hash):
+    user = result.scalars().first()
+    target_hash = user.password_hash if user else _DUMMY_HASH
+    ok = await verify_password_async(password, target_hash)
+    if not user or not ok:
         return templates.TemplateResponse(
             "auth_login.html",
             {
@@ -247,6 +434,11 @@ def login_submit(
             },
         )
 
+    # Upgrade legacy bcrypt hashes now that we know the plain password
+    if pwd_context.needs_update(user.password_hash):
+        user.password_hash = await get_password_hash_async(password)
+        await db.commit()
+
     request.session["user_id"] = user.id
     return RedirectResponse(url="/", status_code=303)
 
@@ -426,7 +618,6 @@ def new_list_submit(
     )
     db.add(custom_list)
     db.commit()
-    db.refresh(custom_list)
 
     return RedirectResponse(url="/my/lists", status_code=303)
 
@@ -481,18 +672,23 @@ def add_to_list(
         raise HTTPException(status_code=404, detail="Manga not found")
 
     # Avoid duplicates
-    existing = (
-        db.query(CustomListItem)
+    exists = (
+        db.query(CustomListItem.id)
         .filter(
             CustomListItem.list_id == custom_list.id,
             CustomListItem.manga_id == manga.id,
         )
         .first()
+        is not None
     )
-    if not existing:
+    if not exists:
         item = CustomListItem(list_id=custom_list.id, manga_id=manga.id)
         db.add(item)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request added it first; it's already in the list
+            db.rollback()
 
     return RedirectResponse(url=f"/manga/{manga_id}", status_code=303)
 
@@ -545,7 +741,12 @@ def delete_list(
     if not custom_list:
         raise HTTPException(status_code=404, detail="List not found or not yours")
 
-    db.delete(custom_list)  # cascade deletes items too
+    # One bulk DELETE for the items; also covers databases created before
+    # custom_list_item.list_id had ON DELETE CASCADE
+    db.query(CustomListItem).filter(
+        CustomListItem.list_id == custom_list.id
+    ).delete(synchronize_session=False)
+    db.delete(custom_list)
     db.commit()
 
     return RedirectResponse(url="/my/lists", status_code=303)
@@ -563,7 +764,19 @@ def admin_home(
 ):
     require_admin(current_user)
 
-    manga_list = db.query(Manga).order_by(Manga.title).all()
+    manga_list = (
+        db.query(
+            Manga.id,
+            Manga.title,
+            Manga.status,
+            Manga.type,
+            func.count(Chapter.id).label("chapter_count"),
+        )
+        .outerjoin(Chapter, Chapter.manga_id == Manga.id)
+        .group_by(Manga.id)
+        .order_by(Manga.title)
+        .all()
+    )
     return templates.TemplateResponse(
         "admin_index.html",
         {
@@ -662,10 +875,12 @@ def admin_create_manga(
         cover_image_url=cover_image_url,
     )
     db.add(manga)
+    db.flush()
+    new_manga_id = manga.id  # read before commit expires the instance
     db.commit()
-    db.refresh(manga)
+    clear_manga_listing_cache()
 
-    return RedirectResponse(url=f"/manga/{manga.id}", status_code=303)
+    return RedirectResponse(url=f"/manga/{new_manga_id}", status_code=303)
 
 
 @app.get("/admin/chapters/new", tags=["admin"])
@@ -676,7 +891,7 @@ def admin_new_chapter_form(
 ):
     require_admin(current_user)
 
-    manga_list = db.query(Manga).order_by(Manga.title).all()
+    manga_list = db.query(Manga.id, Manga.title).order_by(Manga.title).all()
     return templates.TemplateResponse(
         "admin_chapter_new.html",
         {
@@ -717,7 +932,6 @@ def admin_create_chapter(
     )
     db.add(chapter)
     db.commit()
-    db.refresh(chapter)
 
     return RedirectResponse(url=f"/manga/{manga_id}", status_code=303)
 
@@ -726,16 +940,12 @@ def admin_create_chapter(
 # JSON API
 # -----------------------------
 
-@app.get("/api/manga", response_model=List[schemas.MangaOut], tags=["api"])
-def api_list_manga(
+@app.get("/api/manga", response_class=OrjsonResponse, tags=["api"])
+async def api_list_manga(
     q: Optional[str] = Query(default=None, description="Search by title"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(Manga)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Manga.title.ilike(like))
-    return query.order_by(Manga.title).limit(100).all()
+    return OrjsonResponse(content=await get_manga_listing(db, q))
 
 
 @app.get(
@@ -743,25 +953,32 @@ def api_list_manga(
     response_model=schemas.MangaWithChapters,
     tags=["api"],
 )
-def api_get_manga(manga_id: int, db: Session = Depends(get_db)):
-    manga = db.query(Manga).filter(Manga.id == manga_id).first()
+async def api_get_manga(manga_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(Manga)
+        .options(selectinload(Manga.chapters))
+        .where(Manga.id == manga_id)
+    )
+    manga = result.scalar_one_or_none()
     if not manga:
         raise HTTPException(status_code=404, detail="Manga not found")
-    _ = manga.chapters
     return manga
 
 
 @app.get("/api/chapters/{chapter_id}", response_model=schemas.ChapterOut, tags=["api"])
-def api_get_chapter(chapter_id: int, db: Session = Depends(get_db)):
-    chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
+async def api_get_chapter(chapter_id: int, db: AsyncSession = Depends(get_async_db)):
+    chapter = await db.get(Chapter, chapter_id)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
     return chapter
 
 
 @app.get("/api/chapters/{chapter_id}/read", tags=["api"])
-def api_redirect_to_reader(chapter_id: int, db: Session = Depends(get_db)):
-    chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
+async def api_redirect_to_reader(
+    chapter_id: int,
+    db: AsyncSession = Depends(get_async_db),
+):
+    chapter = await db.get(Chapter, chapter_id)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
     return RedirectResponse(url=chapter.external_url)
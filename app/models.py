@@ -8,6 +8,7 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     Float,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -28,7 +29,11 @@ class Manga(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    chapters = relationship("Chapter", back_populates="manga")
+    chapters = relationship(
+        "Chapter",
+        back_populates="manga",
+        order_by="Chapter.number",
+    )
 
 
 class Chapter(Base):
@@ -92,14 +97,23 @@ class CustomList(Base):
         "CustomListItem",
         back_populates="custom_list",
         cascade="all, delete-orphan",
+        passive_deletes=True,  # ON DELETE CASCADE removes the rows
     )
 
 
 class CustomListItem(Base):
     __tablename__ = "custom_list_item"
+    __table_args__ = (
+        # Also serves as the (list_id, manga_id) lookup index
+        UniqueConstraint("list_id", "manga_id", name="uq_list_manga"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    list_id = Column(Integer, ForeignKey("custom_list.id"), index=True, nullable=False)
+    list_id = Column(
+        Integer,
+        ForeignKey("custom_list.id", ondelete="CASCADE"),
+        nullable=False,  # indexed through uq_list_manga
+    )
     manga_id = Column(Integer, ForeignKey("manga.id"), index=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -0,0 +1,25 @@
+from passlib.context import CryptContext
+
+# Kept apart from app.main so the password-hashing worker processes only
+# import passlib, not the whole web app.
+
+# Password hashing (argon2 for new hashes, bcrypt still verified for old ones).
+# The argon2 cost is tuned so a check takes about as long as one against the
+# legacy 12-round bcrypt hashes (~300 ms); keep the two close, or login timing
+# tells which scheme (and so whether an account) is behind a username.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=6,
+    argon2__memory_cost=65536,  # KiB
+    argon2__parallelism=1,
+    bcrypt__rounds=10,
+)
+
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
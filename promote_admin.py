@@ -1,19 +1,31 @@
-from app.database import SessionLocal
+import sys
+
+from sqlalchemy import update
+
+from app.database import session_scope
 from app.models import User
 
-def make_admin(username: str):
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
+def make_admins(usernames: list):
+    # One UPDATE for every name; RETURNING tells us which users exist
+    with session_scope() as db:
+        result = db.execute(
+            update(User)
+            .where(User.username.in_(usernames))
+            .values(role="admin")
+            .returning(User.username)
+        )
+        promoted = set(result.scalars().all())
+
+    for username in usernames:
+        if username in promoted:
+            print(f"User '{username}' is now an admin.")
+        else:
             print(f"User '{username}' not found.")
-            return
-        user.role = "admin"
-        db.commit()
-        print(f"User '{username}' is now an admin.")
-    finally:
-        db.close()
+
+def make_admin(username: str):
+    make_admins([username])
 
 if __name__ == "__main__":
-    target = input("Username to promote to admin: ").strip()
-    make_admin(target)
+    # python promote_admin.py alice bob  (prompts when no names are given)
+    targets = sys.argv[1:] or [input("Username to promote to admin: ").strip()]
+    make_admins(targets)
@@ -1,50 +1,96 @@
-from app.database import SessionLocal, engine
+from itertools import islice
+
+from sqlalchemy import bindparam, insert, select
+
+from app.database import session_scope, engine, init_search_index
 from app.models import Base, Manga, Chapter
 
-def seed():
+_MANGA_COLUMNS = [
+    "title",
+    "alt_title",
+    "description",
+    "status",
+    "content_rating",
+    "type",
+    "cover_image_url",
+]
+
+# Built once so repeated seed() calls reuse SQLAlchemy's compiled-statement cache.
+# INSERT ... SELECT ... WHERE NOT EXISTS only inserts the manga when no row
+# has its title yet, without needing a unique constraint on manga.title.
+_manga = Manga.__table__
+_MANGA_INSERT = (
+    insert(_manga)
+    .from_select(
+        _MANGA_COLUMNS,
+        select(
+            *(bindparam(name, type_=_manga.c[name].type) for name in _MANGA_COLUMNS)
+        ).where(
+            ~select(_manga.c.id)
+            .where(_manga.c.title == bindparam("title"))
+            .correlate(None)
+            .exists()
+        ),
+    )
+    .returning(_manga.c.id)
+)
+_CHAPTER_INSERT = insert(Chapter)
+
+
+# Chapter rows per execute() call; keeps memory bounded for large imports
+CHAPTER_BATCH_SIZE = 1_000
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    yield from iter(lambda: list(islice(it, n)), [])
+
+
+def init_db():
+    # Schema setup; run once, not on every seed
     Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        # Check if anything already exists
-        if db.query(Manga).first():
-            print("Database already has data, skipping seed.")
+    init_search_index()
+
+
+def seed():
+    # One BEGIN ... COMMIT around all inserts
+    with session_scope() as db:
+        # Plain Core inserts; no ORM unit of work needed. If the example
+        # manga already exists the insert does nothing and returns no id.
+        manga_id = db.execute(
+            _MANGA_INSERT,
+            {
+                "title": "Example Manga",
+                "alt_title": "Demo Series",
+                "description": "This is an example manga entry used to test the index.",
+                "status": "ongoing",
+                "content_rating": "safe",
+                "type": "manga",
+                "cover_image_url": None,  # or use your own image URL if you have rights
+            },
+        ).scalar_one_or_none()
+        if manga_id is None:
+            print("Example manga already exists, skipping seed.")
             return
 
-        manga = Manga(
-            title="Example Manga",
-            alt_title="Demo Series",
-            description="This is an example manga entry used to test the index.",
-            status="ongoing",
-            content_rating="safe",
-            type="manga",
-            cover_image_url=None,  # or use your own image URL if you have rights
-        )
-        db.add(manga)
-        db.flush()  # so manga.id is set
-
-        ch1 = Chapter(
-            manga_id=manga.id,
-            number=1,
-            title="Chapter One",
-            language="en",
-            external_url="https://example.com/manga/example-manga/chapter-1",
-            source_name="ExampleSource",
+        chapter_titles = ["Chapter One", "Chapter Two"]
+        chapters = (
+            {
+                "manga_id": manga_id,
+                "number": number,
+                "title": title,
+                "language": "en",
+                "external_url": f"https://example.com/manga/example-manga/chapter-{number}",
+                "source_name": "ExampleSource",
+            }
+            for number, title in enumerate(chapter_titles, 1)
         )
-        ch2 = Chapter(
-            manga_id=manga.id,
-            number=2,
-            title="Chapter Two",
-            language="en",
-            external_url="https://example.com/manga/example-manga/chapter-2",
-            source_name="ExampleSource",
-        )
-
-        db.add_all([ch1, ch2])
-        db.commit()
-        print("Seed data inserted.")
-    finally:
-        db.close()
+        # One executemany per page, so only a page of rows is in memory at once
+        for page in batched(chapters, CHAPTER_BATCH_SIZE):
+            db.execute(_CHAPTER_INSERT, page)
+    print("Seed data inserted.")
 
 
 if __name__ == "__main__":
+    init_db()
     seed()